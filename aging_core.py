@@ -0,0 +1,271 @@
+"""
+Shared outlet configuration and data loading/transformation for the
+inventory aging Streamlit apps.
+"""
+import os
+import streamlit as st
+import pandas as pd
+import numpy as np
+from openpyxl import load_workbook
+
+# Avoid implicit copies when filtering and slicing (always on from pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# --- 0. Configuration and Data Mapping ---
+
+# Dictionary mapping Outlet Codes (to be shown in filter) to Excel file names
+OUTLET_FILES = {
+    "Al madina Logistics": "AML.xlsx",
+    "Azhar GT": "AZT.xlsx", 
+    "Azhar HP": "AZR.xlsx",
+    "Blue pearl": "BPS.xlsx",
+    "Fidha al madina": "FAH.xlsx",
+    "Hadeqat": "HAD.xlsx",
+    "Hilal Al madina": "HAM.xlsx",
+    "Jais": "JZS.xlsx",
+    "Liwan": "LWN.xlsx",
+    "Super Store": "MSS.xlsx",
+    "Sahath": "SAD.xlsx",
+    "Safa al madina Super": "SAM.xlsx",
+    "Safa al madina Oud mehta": "SAO.xlsx",
+    "Sabah ": "SBM.xlsx",
+    "Shams al madina": "SML.xlsx",
+    "Port saeed": "SPS.xlsx",
+    "Tay Tay": "TTD.xlsx"
+}
+ALL_OUTLETS = list(OUTLET_FILES.keys())
+
+# Define the order of aging buckets
+AGING_BUCKETS = ['61-90', '91-120', '121-180', '181-360']
+
+# Wide column names of each bucket's Qty and Value, in AGING_BUCKETS order
+AGING_QTY_COLUMNS = [f'{bucket} Aging Qty' for bucket in AGING_BUCKETS]
+AGING_VALUE_COLUMNS = [f'{bucket} Aging Value' for bucket in AGING_BUCKETS]
+
+# Columns read from each outlet workbook; any other sheet columns are skipped while parsing
+OUTLET_COLUMNS = ['Category'] + AGING_QTY_COLUMNS + AGING_VALUE_COLUMNS
+
+# Selections (outlet + categories) kept by each selection-keyed cache
+SELECTION_CACHE_ENTRIES = 64
+
+# Combined Parquet snapshot of every outlet's rows, written by build_data.py
+AGING_DATA_FILE = "aging_data.parquet"
+
+
+# --- 1. Data Preparation (Loading a Single File) ---
+
+def read_excel_openpyxl(file_name):
+    """
+    Reads the OUTLET_COLUMNS of the active sheet with openpyxl in read-only,
+    values-only mode so the styled workbook is streamed instead of fully loaded.
+    """
+    wb = load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        keep = [i for i, col in enumerate(header) if col in OUTLET_COLUMNS]
+        # Skip blank rows; some sheets carry formatting far below the data
+        data = [[row[i] for i in keep] for row in rows if any(cell is not None for cell in row)]
+        return pd.DataFrame(data, columns=[header[i] for i in keep]).convert_dtypes(dtype_backend="pyarrow")
+    finally:
+        wb.close()
+
+
+def read_excel_file(file_name):
+    """
+    Reads the OUTLET_COLUMNS of an Excel file into pyarrow-backed columns with the
+    Rust-backed calamine engine, falling back to read-only openpyxl if calamine is not available.
+    """
+    try:
+        return pd.read_excel(
+            file_name, engine="calamine", usecols=lambda col: col in OUTLET_COLUMNS, dtype_backend="pyarrow"
+        )
+    except (ImportError, ValueError):
+        return read_excel_openpyxl(file_name)
+
+
+def parquet_is_current(parquet_name, file_name):
+    """
+    Checks whether a Parquet copy can be used in place of an Excel file:
+    it must exist, and the Excel file must be missing (Parquet-only deploy) or not newer.
+    """
+    if not os.path.exists(parquet_name):
+        return False
+    return not os.path.exists(file_name) or os.path.getmtime(parquet_name) >= os.path.getmtime(file_name)
+
+
+def read_outlet_file(file_name):
+    """
+    Reads an outlet workbook through a Parquet copy kept next to it.
+    The copy is (re)built whenever the Excel file is newer than it.
+    """
+    parquet_name = os.path.splitext(file_name)[0] + ".parquet"
+    if parquet_is_current(parquet_name, file_name):
+        return pd.read_parquet(parquet_name, dtype_backend="pyarrow")
+
+    df = read_excel_file(file_name)
+    try:
+        # Write to a temporary file first so a failed write never leaves a broken cache
+        tmp_name = parquet_name + ".tmp"
+        df.to_parquet(tmp_name, compression="zstd", index=False)
+        os.replace(tmp_name, parquet_name)
+    except (ImportError, OSError, ValueError):
+        # Read-only deployments or missing pyarrow: keep serving from Excel
+        pass
+    return df
+
+
+def read_snapshot(selected_outlet, file_name):
+    """
+    Reads one outlet's rows from the combined Parquet snapshot.
+    Returns None when there is no snapshot, it is older than the outlet workbook,
+    or it holds no rows for the outlet.
+    """
+    if not parquet_is_current(AGING_DATA_FILE, file_name):
+        return None
+    # Only the row groups holding this outlet are read
+    df = pd.read_parquet(AGING_DATA_FILE, filters=[('Outlet', '==', selected_outlet)], dtype_backend="pyarrow")
+    # An outlet missing from the snapshot falls back to its own file
+    if df.empty:
+        return None
+    return df.drop(columns=['Outlet'])
+
+
+@st.cache_resource(max_entries=len(ALL_OUTLETS))
+def load_data(selected_outlet):
+    """
+    Loads data for the single selected outlet.
+    The frame is cached by reference (no copy or hashing per rerun) and shared
+    between sessions, so callers must .copy() it before mutating it in place.
+    """
+    if not selected_outlet:
+        return pd.DataFrame()
+    
+    file_name = OUTLET_FILES.get(selected_outlet)
+    if not file_name:
+        st.error(f"Error: No file mapping found for outlet '{selected_outlet}'.")
+        return pd.DataFrame()
+    
+    try:
+        # Read the outlet rows from the combined snapshot, else the outlet file
+        # (via its Parquet copy when up to date)
+        df = read_snapshot(selected_outlet, file_name)
+        if df is None:
+            df = read_outlet_file(file_name)
+        # Add a new column to identify the outlet
+        df['Outlet'] = pd.Categorical([selected_outlet] * len(df), categories=ALL_OUTLETS)
+        # Categorical labels hash and filter as integer codes instead of Python strings
+        df['Category'] = df['Category'].astype('category')
+        return df
+    except FileNotFoundError:
+        st.error(f"🚨 Error: File '{file_name}' for Outlet '{selected_outlet}' not found. Please ensure the file is in the same directory.")
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"An error occurred while reading file '{file_name}': {e}")
+        return pd.DataFrame()
+
+
+# --- 2. Data Transformation (Reshaping Wide to Long) ---
+
+def filter_categories(df, selected_categories):
+    """
+    Keeps the rows of the selected categories; None means every category.
+    Compares integer category codes instead of hashing the label strings.
+    """
+    if selected_categories is None or df.empty:
+        return df
+    selected_codes = df['Category'].cat.categories.get_indexer(list(selected_categories))
+    # get_indexer gives -1 for unknown labels, which is also the code of a NaN Category
+    selected_codes = selected_codes[selected_codes >= 0]
+    category_mask = np.isin(df['Category'].cat.codes.to_numpy(), selected_codes)
+    # No copy: callers only read the filtered rows (copy-on-write covers any later writes)
+    return df[category_mask]
+
+
+def aging_arrays(df):
+    """
+    Returns the wide Qty and Value columns as (rows x buckets) arrays in AGING_BUCKETS order.
+    Missing columns and NaN values introduced by loading become 0.
+    """
+    qty = df.reindex(columns=AGING_QTY_COLUMNS).to_numpy(dtype='float64', na_value=np.nan)
+    value = df.reindex(columns=AGING_VALUE_COLUMNS).to_numpy(dtype='float64', na_value=np.nan)
+    return np.nan_to_num(qty, copy=False), np.nan_to_num(value, copy=False)
+
+
+def transform_data(df):
+    """
+    Reshape the paired Qty and Value columns of every aging bucket into
+    long format with NumPy (no melt or merge), keyed by Outlet, Category, and Aging Bucket.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    n_rows, n_buckets = len(df), len(AGING_BUCKETS)
+
+    # 1. Pull the paired Qty and Value columns as (rows x buckets) arrays
+    qty, value = aging_arrays(df)
+
+    # 2. Flatten row by row: each wide row becomes one long row per bucket
+    df_combined_long = pd.DataFrame({
+        'Outlet': df['Outlet'].repeat(n_buckets).array,
+        'Category': df['Category'].repeat(n_buckets).array,
+        # Define a custom order for the aging buckets
+        'Aging Bucket': pd.Categorical.from_codes(np.tile(np.arange(n_buckets), n_rows), categories=AGING_BUCKETS, ordered=True),
+        'Qty': qty.ravel(),
+        'Value': value.ravel()
+    })
+
+    return df_combined_long
+
+
+def aggregate_by_bucket(df):
+    """
+    Sum Qty and Value per Category straight from the wide bucket columns (no reshape)
+    and split the sums by bucket, so every bucket chart receives its own small frame.
+    """
+    qty, value = aging_arrays(df)
+    df_sums = pd.DataFrame(
+        np.hstack([qty, value]), columns=AGING_QTY_COLUMNS + AGING_VALUE_COLUMNS
+    ).groupby(df['Category'].array, observed=True).sum()
+    return {
+        bucket: pd.DataFrame({
+            'Category': df_sums.index,
+            'Qty': df_sums[qty_col].to_numpy(),
+            'Value': df_sums[value_col].to_numpy()
+        })
+        for bucket, qty_col, value_col in zip(AGING_BUCKETS, AGING_QTY_COLUMNS, AGING_VALUE_COLUMNS)
+    }
+
+
+# --- 2.5. Cached Views Keyed by Selection ---
+# These take the outlet and a tuple of categories (None for all), so a rerun with an
+# unchanged selection is a cache lookup instead of hashing and reshaping a DataFrame.
+# Each cache keeps at most SELECTION_CACHE_ENTRIES selections.
+
+def get_filtered_long(selected_outlet, selected_categories):
+    """
+    Long-format data for the outlet and categories, only needed by the treemap.
+    Not cached itself; get_treemap_totals caches the aggregate built from it.
+    """
+    return transform_data(filter_categories(load_data(selected_outlet), selected_categories))
+
+
+@st.cache_data(max_entries=SELECTION_CACHE_ENTRIES)
+def get_bucket_totals(selected_outlet, selected_categories):
+    """
+    Qty and Value per Category for the outlet and categories, one frame per Aging Bucket.
+    """
+    return aggregate_by_bucket(filter_categories(load_data(selected_outlet), selected_categories))
+
+
+@st.cache_data(max_entries=SELECTION_CACHE_ENTRIES)
+def get_treemap_totals(selected_outlet, selected_categories):
+    """
+    Qty and Value per Outlet, Category and Aging Bucket (one row per treemap leaf)
+    for the outlet and categories.
+    """
+    df = get_filtered_long(selected_outlet, selected_categories)
+    return df.groupby(['Outlet', 'Category', 'Aging Bucket'], observed=True)[['Qty', 'Value']].sum().reset_index()
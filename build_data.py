@@ -0,0 +1,70 @@
+"""
+Builds the combined Parquet snapshot read by the inventory aging apps.
+
+Run this whenever the outlet Excel files change:
+
+    python build_data.py
+
+The snapshot is git-ignored like the other Parquet caches, so a git-based
+deploy has to run this step on the host; without it the apps read the
+Excel files.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aging_core import OUTLET_FILES, AGING_DATA_FILE, read_excel_file
+
+
+def read_one(item):
+    """
+    Reads a single (outlet, file name) pair and tags its rows with the outlet.
+    Returns None when the file does not exist.
+    """
+    outlet, file_name = item
+    if not os.path.exists(file_name):
+        return None
+    df = read_excel_file(file_name)
+    df['Outlet'] = outlet
+    return df
+
+
+def build_snapshot(path=AGING_DATA_FILE):
+    """
+    Reads every outlet workbook once and writes all rows, tagged by Outlet,
+    to a single zstd-compressed Parquet file with one row group per outlet
+    so readers can skip the outlets they do not need.
+    """
+    # The workbooks are independent, so parse them concurrently (map keeps OUTLET_FILES order)
+    with ThreadPoolExecutor(max_workers=min(8, len(OUTLET_FILES))) as executor:
+        results = list(executor.map(read_one, OUTLET_FILES.items()))
+
+    all_dfs = []
+    for (outlet, file_name), df in zip(OUTLET_FILES.items(), results):
+        if df is None:
+            print(f"Skipping '{outlet}': file '{file_name}' not found.")
+            continue
+        all_dfs.append(df)
+
+    if not all_dfs:
+        raise SystemExit("No outlet files found; nothing to build.")
+
+    # Concatenate first so every outlet is written with one common schema
+    table = pa.Table.from_pandas(pd.concat(all_dfs, ignore_index=True), preserve_index=False)
+
+    tmp_path = path + ".tmp"
+    with pq.ParquetWriter(tmp_path, table.schema, compression="zstd", use_dictionary=True) as writer:
+        offset = 0
+        for df in all_dfs:
+            writer.write_table(table.slice(offset, len(df)))
+            offset += len(df)
+    os.replace(tmp_path, path)
+
+    print(f"Wrote {table.num_rows} rows for {len(all_dfs)} outlets to '{path}'.")
+
+
+if __name__ == "__main__":
+    build_snapshot()
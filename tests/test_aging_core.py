@@ -0,0 +1,27 @@
+import os
+import shutil
+
+import aging_core
+from aging_core import load_data, read_outlet_file, read_snapshot
+from build_data import build_snapshot
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_outlet_missing_from_snapshot_falls_back_to_its_parquet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(REPO_DIR, "AZR.xlsx"), "AZR.xlsx")
+    shutil.copy(os.path.join(REPO_DIR, "TTD.xlsx"), "TTD.xlsx")
+
+    # Leave only the per-outlet Parquet copy of TTD behind, then build the snapshot without it
+    expected = read_outlet_file("TTD.xlsx")
+    os.remove("TTD.xlsx")
+    build_snapshot()
+
+    assert read_snapshot("Tay Tay", "TTD.xlsx") is None
+
+    load_data.clear()
+    df = load_data("Tay Tay")
+    assert len(df) == len(expected) > 0
+    assert (df["Outlet"] == "Tay Tay").all()
+    assert os.path.exists(aging_core.AGING_DATA_FILE)
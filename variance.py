@@ -1,35 +1,31 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.io as pio
+import pyarrow as pa
+
+from aging_core import (
+    ALL_OUTLETS,
+    AGING_BUCKETS,
+    SELECTION_CACHE_ENTRIES,
+    load_data,
+    aging_arrays,
+    filter_categories,
+    get_bucket_totals,
+    get_treemap_totals,
+)
+
+# --- 0. Configuration ---
+# Outlet files, aging buckets and the data loading/transformation steps live in aging_core.py
 
-# --- 0. Configuration and Data Mapping ---
-
-# Dictionary mapping Outlet Codes (to be shown in filter) to Excel file names
-OUTLET_FILES = {
-    "Al madina Logistics": "AML.xlsx",
-    "Azhar GT": "AZT.xlsx", 
-    "Azhar HP": "AZR.xlsx",
-    "Blue pearl": "BPS.xlsx",
-    "Fidha al madina": "FAH.xlsx",
-    "Hadeqat": "HAD.xlsx",
-    "Hilal Al madina": "HAM.xlsx",
-    "Jais": "JZS.xlsx",
-    "Liwan": "LWN.xlsx",
-    "Super Store": "MSS.xlsx",
-    "Sahath": "SAD.xlsx",
-    "Safa al madina Super": "SAM.xlsx",
-    "Safa al madina Oud mehta": "SAO.xlsx",
-    "Sabah ": "SBM.xlsx",
-    "Shams al madina": "SML.xlsx",
-    "Port saeed": "SPS.xlsx",
-    "Tay Tay": "TTD.xlsx"
-}
-ALL_OUTLETS = list(OUTLET_FILES.keys())
 OUTLET_OPTIONS = ALL_OUTLETS
 
-# Define the order of aging buckets
-AGING_BUCKETS = ['61-90', '91-120', '121-180', '181-360']
+# Rows shown per page in the original data table
+TABLE_PAGE_SIZE = 1000
+
+# Hover number formats for the bar charts (the same for both metrics)
+HOVER_FORMAT_QTY = ',.0f'
+HOVER_FORMAT_VAL = ',.2f'
 
 
 # --- 🔐 Passwords for Outlets ---
@@ -54,79 +50,6 @@ OUTLET_PASSWORDS = {
 }
 
 
-# --- 1. Data Preparation (Loading a Single File) ---
-
-@st.cache_data
-def load_data(selected_outlet):
-    """
-    Loads data for the single selected outlet.
-    """
-    if not selected_outlet:
-        return pd.DataFrame()
-    
-    file_name = OUTLET_FILES.get(selected_outlet)
-    if not file_name:
-        st.error(f"Error: No file mapping found for outlet '{selected_outlet}'.")
-        return pd.DataFrame()
-    
-    try:
-        # Read the Excel file
-        df = pd.read_excel(file_name)
-        # Add a new column to identify the outlet
-        df['Outlet'] = selected_outlet
-        return df
-    except FileNotFoundError:
-        st.error(f"🚨 Error: File '{file_name}' for Outlet '{selected_outlet}' not found. Please ensure the file is in the same directory.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"An error occurred while reading file '{file_name}': {e}")
-        return pd.DataFrame()
-
-
-# --- 2. Data Transformation (Melting and Merging) ---
-
-@st.cache_data
-def transform_data(df):
-    """
-    Melt Qty and Value separately and then merge them back together 
-    on Outlet, Category, and Aging Bucket.
-    """
-    if df.empty:
-        return pd.DataFrame()
-
-    # 1. Melt Qty columns
-    df_qty_long = df.melt(
-        id_vars=['Outlet', 'Category'],
-        value_vars=[col for col in df.columns if 'Qty' in col],
-        var_name='Aging Bucket_Qty',
-        value_name='Qty'
-    )
-    df_qty_long['Aging Bucket'] = df_qty_long['Aging Bucket_Qty'].str.replace(' Aging Qty', '', regex=False)
-    df_qty_long = df_qty_long[['Outlet', 'Category', 'Aging Bucket', 'Qty']]
-
-    # 2. Melt Value columns
-    df_value_long = df.melt(
-        id_vars=['Outlet', 'Category'],
-        value_vars=[col for col in df.columns if 'Value' in col],
-        var_name='Aging Bucket_Value',
-        value_name='Value'
-    )
-    df_value_long['Aging Bucket'] = df_value_long['Aging Bucket_Value'].str.replace(' Aging Value', '', regex=False)
-    df_value_long = df_value_long[['Outlet', 'Category', 'Aging Bucket', 'Value']]
-    
-    # 3. Merge Qty and Value together
-    df_combined_long = pd.merge(df_qty_long, df_value_long, on=['Outlet', 'Category', 'Aging Bucket'])
-
-    # Define a custom order for the aging buckets
-    df_combined_long['Aging Bucket'] = pd.Categorical(df_combined_long['Aging Bucket'], categories=AGING_BUCKETS, ordered=True)
-    
-    # Fill NaN values introduced by merging or loading with 0 for metrics
-    df_combined_long['Qty'] = df_combined_long['Qty'].fillna(0)
-    df_combined_long['Value'] = df_combined_long['Value'].fillna(0)
-
-    return df_combined_long
-
-
 # --- 3. Streamlit App Layout and Logic ---
 
 st.set_page_config(layout="wide", page_title="Single-Outlet Inventory Aging Analysis", initial_sidebar_state="expanded")
@@ -166,12 +89,12 @@ else:
     st.sidebar.success("✅ This outlet does not require a password.")
 
 
-# Load and transform data based on the single selected outlet
+# Load data based on the single selected outlet (reshaped after category filtering).
+# load_data returns the shared cached frame itself, so it is only read below.
 df_wide_original = load_data(selected_outlet)
-df_combined_long = transform_data(df_wide_original.copy())
 
-# Check if data loading or transformation failed
-if df_combined_long.empty:
+# Check if data loading failed
+if df_wide_original.empty:
     st.info(f"Data for {selected_outlet} could not be loaded or is empty. Check warnings above.")
     st.stop()
     
@@ -188,16 +111,12 @@ view_option = st.sidebar.radio(
 if 'Qty' in view_option:
     metric_col = 'Qty'
     title_suffix = 'Quantity'
-    hover_format_qty = ',.0f' 
-    hover_format_val = ',.2f' 
 else:
     metric_col = 'Value'
     title_suffix = 'Value'
-    hover_format_qty = ',.0f' 
-    hover_format_val = ',.2f'
 
-df_plot = df_combined_long
-all_categories = df_plot['Category'].unique().tolist()
+# Category is categorical, so its options are known without scanning the rows
+all_categories = df_wide_original['Category'].cat.categories.tolist()
 
 st.sidebar.markdown("---")
 
@@ -226,17 +145,23 @@ else:
         st.stop()
 
 
-# Apply filters
-df_filtered_long = df_plot[df_plot['Category'].isin(selected_categories)].copy() 
-df_filtered_wide = df_wide_original[df_wide_original['Category'].isin(selected_categories)].copy()
+# Apply filters on the wide frame; only the treemap reshapes it to long format.
+# None stands for every category (ticked 'Select All' or every one picked by hand),
+# so that path needs no row mask and shares its cache entries.
+if set(selected_categories) >= set(all_categories):
+    category_key = None
+else:
+    category_key = tuple(sorted(selected_categories))
+df_filtered_wide = filter_categories(df_wide_original, category_key)
 
 
 # --- 4.5. Summary Metrics (UPDATED TO REMOVE $ SIGN) ---
 
-# Calculate totals per Aging Bucket
-summary_df = df_filtered_long.groupby('Aging Bucket')[['Value', 'Qty']].sum().reindex(AGING_BUCKETS).fillna(0)
-grand_total_value = summary_df['Value'].sum()
-grand_total_qty = summary_df['Qty'].sum()
+# Calculate totals per Aging Bucket as column sums of the wide bucket columns
+qty_by_bucket, value_by_bucket = aging_arrays(df_filtered_wide)
+# Rows follow AGING_BUCKETS, columns are (Value, Qty)
+summary_values = np.column_stack([value_by_bucket.sum(axis=0), qty_by_bucket.sum(axis=0)])
+grand_total_value, grand_total_qty = summary_values.sum(axis=0)
 
 
 st.markdown(f"### Current View Summary for Outlet: {selected_outlet}")
@@ -270,8 +195,7 @@ cols_bucket = st.columns(4)
 for i, bucket in enumerate(AGING_BUCKETS):
     with cols_bucket[i]:
         st.markdown(f"**{bucket} Days**")
-        bucket_value = summary_df.loc[bucket, 'Value']
-        bucket_qty = summary_df.loc[bucket, 'Qty']
+        bucket_value, bucket_qty = summary_values[i]
         
         # Display Value - REMOVED $
         st.markdown(f"💰 Value: **{bucket_value:,.2f}**")
@@ -284,14 +208,17 @@ st.markdown("---")
 
 # --- 5. Visualization Functions ---
 
-def plot_horizontal_bar(df, metric_col, bucket, title_suffix, color):
-    """Creates a horizontal bar chart for a single aging bucket with dual tooltips."""
-    
-    df_bucket = df[(df['Aging Bucket'] == bucket) & (df[metric_col] > 0)]
+# Figures are built once per selection and cached as Plotly JSON; reruns with the
+# same selection (tab switches, unrelated widgets) only deserialize them.
+
+@st.cache_data(show_spinner=False, max_entries=SELECTION_CACHE_ENTRIES)
+def build_bar_json(selected_outlet, selected_categories, metric_col, bucket, title_suffix, color):
+    """Builds the bar chart for a single aging bucket as Plotly JSON (None when the bucket has no data)."""
+    df = get_bucket_totals(selected_outlet, selected_categories)[bucket]
+    df_bucket = df[df[metric_col] > 0]
     
     if df_bucket.empty:
-        st.info(f"No {title_suffix} data found for the {bucket} bucket in selected categories.")
-        return
+        return None
 
     df_bucket = df_bucket.sort_values(by=metric_col, ascending=True)
 
@@ -310,40 +237,60 @@ def plot_horizontal_bar(df, metric_col, bucket, title_suffix, color):
     # Custom Hover Template - REMOVED $ from the Value line
     custom_hover_template = (
         '<b>Category:</b> %{y}<br>' +
-        f'<b>Aging Qty:</b> %{{customdata[0]:{hover_format_qty}}}<br>' +
-        f'<b>Aging Value:</b> %{{customdata[1]:{hover_format_val}}}<br>' +
+        f'<b>Aging Qty:</b> %{{customdata[0]:{HOVER_FORMAT_QTY}}}<br>' +
+        f'<b>Aging Value:</b> %{{customdata[1]:{HOVER_FORMAT_VAL}}}<br>' +
         '<extra></extra>' 
     )
     
     fig.update_traces(customdata=df_bucket[['Qty', 'Value']], 
                       hovertemplate=custom_hover_template)
     
-    st.plotly_chart(fig, use_container_width=True)
+    return fig.to_json()
 
 
-def plot_treemap(df, metric_col, title_suffix, outlet_name):
-    """Creates a treemap to show hierarchical contribution by Category and Aging Bucket."""
+def plot_horizontal_bar(selected_outlet, selected_categories, metric_col, bucket, title_suffix, color):
+    """Creates a horizontal bar chart for a single aging bucket with dual tooltips."""
+    fig_json = build_bar_json(selected_outlet, selected_categories, metric_col, bucket, title_suffix, color)
+    
+    if fig_json is None:
+        st.info(f"No {title_suffix} data found for the {bucket} bucket in selected categories.")
+        return
+    
+    st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=SELECTION_CACHE_ENTRIES)
+def build_treemap_json(selected_outlet, selected_categories, metric_col, title_suffix):
+    """Builds the Category -> Aging Bucket treemap as Plotly JSON (None when there is no data)."""
+    df = get_treemap_totals(selected_outlet, selected_categories)
     df_filtered = df[df[metric_col] > 0]
-    if df_filtered.empty: return st.warning("No data to display in the Treemap.")
+    if df_filtered.empty: return None
         
-    path_list = [px.Constant(f"Outlet: {outlet_name}"), 'Category', 'Aging Bucket']
+    path_list = [px.Constant(f"Outlet: {selected_outlet}"), 'Category', 'Aging Bucket']
         
     fig = px.treemap(
         df_filtered,
         path=path_list,
         values=metric_col,
-        title=f'Hierarchical Aging Contribution for Outlet {outlet_name} ({title_suffix})',
+        title=f'Hierarchical Aging Contribution for Outlet {selected_outlet} ({title_suffix})',
         color=metric_col,
         color_continuous_scale='Reds',
         hover_data=['Category', 'Aging Bucket', 'Qty', 'Value'] 
     )
     fig.update_layout(margin=dict(t=50, l=25, r=25, b=25))
-    st.plotly_chart(fig, use_container_width=True)
+    return fig.to_json()
+
+
+def plot_treemap(selected_outlet, selected_categories, metric_col, title_suffix):
+    """Creates a treemap to show hierarchical contribution by Category and Aging Bucket."""
+    fig_json = build_treemap_json(selected_outlet, selected_categories, metric_col, title_suffix)
+    if fig_json is None: return st.warning("No data to display in the Treemap.")
+    st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
 
 # --- 6. Main Content Tabs ---
 tab1, tab2, tab3 = st.tabs(["📈 Aging Distribution (Days)", "🌳 Treemap", "📋 Original Table Data"])
 
-if df_filtered_long.empty:
+if df_filtered_wide.empty:
     st.info("No data to display for the selected outlet and categories.")
 else:
     with tab1:
@@ -356,24 +303,30 @@ else:
         col_charts_1, col_charts_2 = st.columns(2)
         
         with col_charts_1:
-            plot_horizontal_bar(df_filtered_long, metric_col, AGING_BUCKETS[0], title_suffix, bucket_colors[0])
+            plot_horizontal_bar(selected_outlet, category_key, metric_col, AGING_BUCKETS[0], title_suffix, bucket_colors[0])
             st.markdown("---")
-            plot_horizontal_bar(df_filtered_long, metric_col, AGING_BUCKETS[1], title_suffix, bucket_colors[1])
+            plot_horizontal_bar(selected_outlet, category_key, metric_col, AGING_BUCKETS[1], title_suffix, bucket_colors[1])
 
         with col_charts_2:
-            plot_horizontal_bar(df_filtered_long, metric_col, AGING_BUCKETS[2], title_suffix, bucket_colors[2])
+            plot_horizontal_bar(selected_outlet, category_key, metric_col, AGING_BUCKETS[2], title_suffix, bucket_colors[2])
             st.markdown("---")
-            plot_horizontal_bar(df_filtered_long, metric_col, AGING_BUCKETS[3], title_suffix, bucket_colors[3])
+            plot_horizontal_bar(selected_outlet, category_key, metric_col, AGING_BUCKETS[3], title_suffix, bucket_colors[3])
 
     with tab2:
         st.header(f"Hierarchical Aging Contribution: {title_suffix}")
-        plot_treemap(df_filtered_long, metric_col, title_suffix, selected_outlet)
+        plot_treemap(selected_outlet, category_key, metric_col, title_suffix)
         st.caption("The Treemap shows the breakdown: **Category** $\\rightarrow$ **Aging Bucket**.")
 
     with tab3:
         st.header(f"Original Data Table (Filtered Wide Format for Outlet: {selected_outlet})")
         st.caption("This table displays the raw data for the selected outlet, filtered by your Category Selection.")
-        st.dataframe(df_filtered_wide.drop(columns=['Outlet'], errors='ignore'), use_container_width=True)
+        # Send the table as Arrow, one page at a time, instead of the whole frame on every rerun
+        table_data = pa.Table.from_pandas(df_filtered_wide.drop(columns=['Outlet'], errors='ignore'), preserve_index=False)
+        page_count = max(1, -(-table_data.num_rows // TABLE_PAGE_SIZE))
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1, step=1)
+        st.dataframe(table_data.slice((page - 1) * TABLE_PAGE_SIZE, TABLE_PAGE_SIZE), use_container_width=True)
 
 st.sidebar.markdown("---")
 st.sidebar.caption("App built for single-outlet inventory aging analysis.")